@@ -1,8 +1,13 @@
 # app.py
+import io
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import xxhash
 
 st.set_page_config(
     page_title="Competitor Team Dashboard",
@@ -17,13 +22,6 @@ if not uploaded_file:
     st.info("Please upload a CSV file to begin.")
     st.stop()
 
-# Load
-try:
-    df = pd.read_csv(uploaded_file)
-except Exception as e:
-    st.error(f"Failed to read CSV: {e}")
-    st.stop()
-
 # Expected columns and safe defaults if missing
 expected_cols_defaults = {
     "Firm Name": "Unknown Firm",
@@ -42,17 +40,96 @@ expected_cols_defaults = {
     "Committee memberships": ""
 }
 
-# Add missing cols with defaults
-for col, default in expected_cols_defaults.items():
-    if col not in df.columns:
-        df[col] = default
+categorical_cols = [
+    "Firm Name",
+    "Current Office",
+    "Harmonized title",
+    "Harmonized team",
+    "Harmonized sub-team",
+    "Masters Degree",
+    "Undergraduate",
+]
+
+# Hash the upload once; every cache below is keyed on this digest (plus filter inputs)
+# and takes the large objects as underscore-prefixed args, which Streamlit skips hashing.
+file_bytes = uploaded_file.getvalue()
+file_digest = xxhash.xxh3_64(file_bytes).hexdigest()
+
+# Rename repeated headers the way pd.read_csv does ("Name", "Name.1", ...) so the
+# column selection below stays unambiguous
+def dedupe_column_names(names):
+    seen = set()
+    suffixes = {}
+    deduped = []
+    for name in names:
+        new_name = name
+        while new_name in seen:
+            suffixes[name] = suffixes.get(name, 0) + 1
+            new_name = f"{name}.{suffixes[name]}"
+        seen.add(new_name)
+        deduped.append(new_name)
+    return deduped
+
+# Parse + normalize once per uploaded file; reruns reuse the cached frame. Parsed frames
+# are the largest cached objects and every session shares them, so keep only a few, briefly.
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def load_csv(file_digest, _file_bytes: bytes) -> pd.DataFrame:
+    # Arrow's multithreaded parser; empty strings become nulls as with pd.read_csv.
+    # Text columns are pinned to string so Arrow never infers them as null/bool/int/timestamp
+    # (an all-blank column would otherwise come back null-typed and fail the category cast).
+    table = pacsv.read_csv(
+        io.BytesIO(_file_bytes),
+        convert_options=pacsv.ConvertOptions(
+            strings_can_be_null=True,
+            column_types={c: pa.string() for c in expected_cols_defaults if c != "Year Joined"},
+        ),
+    )
+    # Arrow falls back to binary for text that isn't valid UTF-8; fail like pd.read_csv would
+    binary_cols = [f.name for f in table.schema if pa.types.is_binary(f.type) or pa.types.is_large_binary(f.type)]
+    if binary_cols:
+        raise ValueError(f"file is not valid UTF-8 (columns: {', '.join(binary_cols)}); re-save it as UTF-8 and upload again")
+    table = table.rename_columns(dedupe_column_names(table.column_names))
+    # Only the expected columns are used downstream; drop the rest before converting
+    table = table.select([c for c in table.column_names if c in expected_cols_defaults])
+    # An all-blank Year Joined is still inferred as null; give it a concrete type
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema
+    ]))
+    # Keep columns Arrow-backed so st.dataframe can ship them without a pandas->Arrow conversion
+    df = table.to_pandas(types_mapper=pd.ArrowDtype)
+
+    # Add missing cols with defaults
+    for col, default in expected_cols_defaults.items():
+        if col not in df.columns:
+            df[col] = default
+    df = df[list(expected_cols_defaults.keys())]
 
-# Convert Year Joined to numeric (coerce errors -> NaN)
-df["Year Joined"] = pd.to_numeric(df["Year Joined"], errors="coerce")
+    # Convert Year Joined to numeric (coerce errors -> NA); years fit in nullable Int16,
+    # so out-of-range typos (e.g. 20150101) are coerced to NA too rather than failing the cast
+    years = pd.to_numeric(df["Year Joined"], errors="coerce").round()
+    years = years.where(years.between(np.iinfo(np.int16).min, np.iinfo(np.int16).max).fillna(False))
+    df["Year Joined"] = years.astype("Int16")
+
+    # Low-cardinality text columns as category: isin/groupby work on int codes
+    for col in categorical_cols:
+        df[col] = df[col].astype("category")
+    return df
+
+# Load
+try:
+    df = load_csv(file_digest, file_bytes)
+except Exception as e:
+    st.error(f"Failed to read CSV: {e}")
+    st.stop()
 
 # Helper to get unique sorted options or a fallback
-def unique_options(series, fallback=None):
-    vals = series.dropna().unique().tolist()
+@st.cache_data(show_spinner=False, max_entries=16, ttl=3600)
+def get_unique_options(file_digest, _df, col, fallback=None):
+    series = _df[col]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        vals = series.cat.categories.tolist()
+    else:
+        vals = series.dropna().unique().tolist()
     vals = [v for v in vals if str(v).strip() != ""]
     if not vals:
         return [fallback] if fallback is not None else []
@@ -60,18 +137,25 @@ def unique_options(series, fallback=None):
 
 # Sidebar filters
 st.sidebar.header("Filters")
-firms_options = unique_options(df["Firm Name"], fallback="Unknown Firm")
+firms_options = get_unique_options(file_digest, df, "Firm Name", fallback="Unknown Firm")
 selected_firms = st.sidebar.multiselect("Select Firms", options=firms_options, default=firms_options[:2])
 
-offices_options = unique_options(df["Current Office"], fallback=None)
+offices_options = get_unique_options(file_digest, df, "Current Office", fallback=None)
 selected_offices = st.sidebar.multiselect("Select Offices", options=offices_options, default=offices_options if len(offices_options)<=5 else offices_options[:3])
 
 # Year Joined filter only shown if meaningful year data exists
-years_nonnull = df["Year Joined"].dropna()
-has_years = not years_nonnull.empty
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def get_year_stats(file_digest, _df):
+    years = _df["Year Joined"]
+    if not years.notna().any():
+        return None
+    # Int16 min/max skip NA, so no separate dropna pass is needed
+    return int(years.min()), int(years.max())
+
+year_stats = get_year_stats(file_digest, df)
+has_years = year_stats is not None
 if has_years:
-    min_year = int(years_nonnull.min())
-    max_year = int(years_nonnull.max())
+    min_year, max_year = year_stats
     if min_year == max_year:
         year_range = st.sidebar.slider("Year Joined (single year available)", min_year, max_year, (min_year, max_year))
     else:
@@ -80,29 +164,46 @@ else:
     st.sidebar.info("No valid 'Year Joined' data found — year filter disabled.")
     year_range = None
 
-# Apply filters
-filtered_df = df.copy()
-if selected_firms:
-    filtered_df = filtered_df[filtered_df["Firm Name"].isin(selected_firms)]
-if selected_offices:
-    filtered_df = filtered_df[filtered_df["Current Office"].isin(selected_offices)]
-if has_years and year_range is not None:
-    # keep rows with Year Joined in range (rows with NaN year will be excluded unless you want to include them)
-    filtered_df = filtered_df[
-        (filtered_df["Year Joined"].notna()) &
-        (filtered_df["Year Joined"].between(year_range[0], year_range[1]))
-    ]
+# Apply filters as a single combined mask; cached so unrelated reruns skip the scans.
+# Filter-keyed caches are bounded: every filter combination would otherwise pin a result.
+@st.cache_data(show_spinner=False, max_entries=32)
+def apply_filters(file_digest, _df, firms, offices, year_range):
+    mask = np.ones(len(_df), dtype=bool)
+    if firms:
+        mask &= _df["Firm Name"].isin(firms).to_numpy()
+    if offices:
+        mask &= _df["Current Office"].isin(offices).to_numpy()
+    if year_range is not None:
+        # keep rows with Year Joined in range (rows with NaN year will be excluded unless you want to include them)
+        years = _df["Year Joined"]
+        yr = years.to_numpy(dtype=np.int16, na_value=0)
+        mask &= (yr >= year_range[0]) & (yr <= year_range[1]) & ~years.isna().to_numpy()
+    return _df.loc[mask]
+
+filter_key = (tuple(selected_firms), tuple(selected_offices), year_range if has_years else None)
+filtered_df = apply_filters(file_digest, df, *filter_key)
 
 if filtered_df.empty:
     st.warning("No rows after applying filters. Try changing filters or upload a different file.")
     st.stop()
 
 # KPI Cards (safe calculations)
-total_team = int(filtered_df["Name"].nunique()) if "Name" in filtered_df.columns else int(len(filtered_df))
-avg_year_val = filtered_df["Year Joined"].dropna().mean()
+def used_categories(series):
+    # Categories actually present, via a bincount over the int codes (-1 marks NaN)
+    codes = series.cat.codes.to_numpy()
+    present = np.bincount(codes[codes >= 0], minlength=len(series.cat.categories)) > 0
+    return series.cat.categories[present]
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_kpis(file_digest, filter_key, _df):
+    total_team = int(_df["Name"].nunique()) if "Name" in _df.columns else int(len(_df))
+    years = _df["Year Joined"].to_numpy(dtype="float64", na_value=np.nan)
+    years = years[~np.isnan(years)]
+    avg_year_val = years.mean() if years.size else np.nan
+    return total_team, avg_year_val, len(used_categories(_df["Current Office"])), len(used_categories(_df["Harmonized title"]))
+
+total_team, avg_year_val, num_offices, unique_titles = compute_kpis(file_digest, filter_key, filtered_df)
 avg_year = f"{int(avg_year_val)}" if not np.isnan(avg_year_val) else "N/A"
-num_offices = int(filtered_df["Current Office"].nunique())
-unique_titles = int(filtered_df["Harmonized title"].nunique())
 
 col1, col2, col3, col4 = st.columns(4)
 col1.metric("Total Team Members", total_team)
@@ -112,79 +213,165 @@ col4.metric("Unique Titles", unique_titles)
 
 # Safe plotting helpers
 def can_plot_column(df_, col):
-    return (col in df_.columns) and (not df_[col].dropna().empty) and (df_[col].astype(str).str.strip().ne("").any())
+    if col not in df_.columns:
+        return False
+    s = df_[col]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # Check the (few) categories present instead of stringifying every row
+        return bool((used_categories(s).astype(str).str.strip() != "").any())
+    return bool(s.dropna().astype(str).str.strip().ne("").any())
+
+# observed=True only skips empty groups; the key columns still carry every category,
+# which Plotly would turn into empty traces/legend entries
+def drop_unused_categories(counts):
+    for col in counts.select_dtypes("category").columns:
+        counts[col] = counts[col].cat.remove_unused_categories()
+    return counts
+
+# Count groups of categorical keys by packing their int codes into one int64 per row
+# (mixed radix, first key most significant) and running a single np.unique over it.
+# np.unique sorts, so rows come out in the same order groupby(sort=True) would give.
+def packed_group_counts(df_, keys, count_col=None):
+    cols = [df_[k] for k in keys]
+    codes = [c.cat.codes.to_numpy().astype(np.int64) for c in cols]
+    valid = np.logical_and.reduce([c >= 0 for c in codes])
+    composite = np.zeros(int(valid.sum()), dtype=np.int64)
+    for col, c in zip(cols, codes):
+        composite = composite * len(col.cat.categories) + c[valid]
+    packed, inverse = np.unique(composite, return_inverse=True)
+    if count_col is None:
+        counts = np.bincount(inverse)
+    else:
+        # Like groupby(...)[count_col].count(): rows with a null count_col add 0
+        present = df_[count_col].notna().to_numpy(dtype=np.float64)[valid]
+        counts = np.bincount(inverse, weights=present).astype(np.int64)
 
-def safe_histogram(df_, x, color, title, barmode="group"):
+    # Unpack back to per-key codes, least significant key first
+    labels = {}
+    for col in reversed(cols):
+        n = len(col.cat.categories)
+        labels[col.name] = pd.Categorical.from_codes(packed % n, dtype=col.dtype)
+        packed = packed // n
+    result = pd.DataFrame({k: labels[k] for k in keys})
+    result["Count"] = counts
+    return result
+
+# Aggregate once per key set so charts get group-level rows instead of every record.
+# Rows are counted (histogram semantics) unless count_col is given, in which case only
+# rows with a non-null count_col are counted. Several charts share each filter
+# combination, hence the larger cache bound.
+@st.cache_data(show_spinner=False, max_entries=128)
+def group_counts(file_digest, filter_key, _df, keys, count_col=None):
+    if not _df.empty and all(isinstance(_df[k].dtype, pd.CategoricalDtype) for k in keys):
+        return drop_unused_categories(packed_group_counts(_df, keys, count_col))
+    grouped = _df.groupby(list(keys), observed=True)
+    counts = grouped.size() if count_col is None else grouped[count_col].count()
+    return drop_unused_categories(counts.reset_index(name="Count"))
+
+# Figures are memoized per (upload, filters, chart) and returned by reference --
+# cache_resource skips pickling, and no-op reruns rebuild nothing. It is shared across
+# sessions, so entries are bounded and expire.
+@st.cache_resource(show_spinner=False, max_entries=64, ttl=3600)
+def build_bar(file_digest, filter_key, _df, x, color, title, barmode="group", text=None, count_col=None):
+    keys = (x,) if color in (None, x) else (x, color)
+    counts = group_counts(file_digest, filter_key, _df, keys, count_col)
+    return px.bar(counts, x=x, y="Count", color=color, barmode=barmode, title=title, text=text)
+
+@st.cache_resource(show_spinner=False, max_entries=64, ttl=3600)
+def build_hiring_trend(file_digest, filter_key, _df):
+    yt = group_counts(file_digest, filter_key, _df, ("Year Joined", "Firm Name"), count_col="Name")
+    if yt.empty:
+        return None
+    return px.line(yt, x="Year Joined", y="Count", color="Firm Name", markers=True, render_mode="webgl", title="Hiring Trends Over Time")
+
+def safe_bar(df_, x, color, title, barmode="group"):
     if not can_plot_column(df_, x):
         st.info(f"Skipping '{title}': no data for column '{x}'.")
         return
     try:
-        fig = px.histogram(df_, x=x, color=color if color in df_.columns else None, barmode=barmode, title=title)
+        color = color if color in df_.columns else None
+        fig = build_bar(file_digest, filter_key, df_, x, color, title, barmode)
         st.plotly_chart(fig, use_container_width=True)
     except Exception as e:
         st.error(f"Could not render {title}: {e}")
 
-# Dashboard Tabs and layout
-tab1, tab2, tab3 = st.tabs(["📊 Overview", "👥 Composition", "🌍 Geography & Education"])
+# Melt + count degrees once per upload/filter selection; only the counts reach the chart
+@st.cache_data(show_spinner=False, max_entries=32)
+def get_edu_counts(file_digest, filter_key, _df, cols):
+    # melt only existing edu columns
+    melted = _df.melt(id_vars=["Firm Name"], value_vars=list(cols), var_name="Degree Type", value_name="Degree")
+    melted = melted[melted["Degree"].notna() & melted["Degree"].astype(str).str.strip().ne("")]
+    return drop_unused_categories(melted.groupby(["Firm Name", "Degree Type", "Degree"], observed=True).size().reset_index(name="Count"))
 
-with tab1:
-    r1c1 = st.columns(1)
-    # Team Size by Firm
-    if can_plot_column(filtered_df, "Firm Name"):
-        team_size = filtered_df.groupby("Firm Name")["Name"].count().reset_index().rename(columns={"Name":"Count"})
-        fig1 = px.bar(team_size, x="Firm Name", y="Count", title="Team Size by Firm", text="Count", color="Firm Name")
-        st.plotly_chart(fig1, use_container_width=True)
-    else:
-        st.info("No 'Firm Name' data to show Team Size.")
-    
-
-    # Hiring trends (if Year Joined exists)
-    if has_years:
-        yt = filtered_df.groupby(["Year Joined", "Firm Name"])["Name"].count().reset_index().rename(columns={"Name":"Count"})
-        yt = yt.dropna(subset=["Year Joined"])
-        if not yt.empty:
-            fig3 = px.line(yt, x="Year Joined", y="Count", color="Firm Name", markers=True, title="Hiring Trends Over Time")
-            st.plotly_chart(fig3, use_container_width=True)
+# Dashboard Tabs and layout -- st.tabs runs every tab's body on each rerun, so a radio
+# selector (persisted in session_state) lets only the visible view build its charts
+tab_labels = ["📊 Overview", "👥 Composition", "🌍 Geography & Education"]
+
+# Switching views only reruns this fragment; filter changes still rerun the whole app
+# and hand the fragment a fresh filtered_df
+@st.fragment
+def render_views(filtered_df):
+    st.radio("View", tab_labels, key="active_tab", horizontal=True, label_visibility="collapsed")
+
+    if st.session_state.active_tab == tab_labels[0]:
+        # Team Size by Firm
+        if can_plot_column(filtered_df, "Firm Name"):
+            fig1 = build_bar(file_digest, filter_key, filtered_df, "Firm Name", "Firm Name", "Team Size by Firm", barmode="relative", text="Count", count_col="Name")
+            st.plotly_chart(fig1, use_container_width=True)
         else:
-            st.info("Year data exists but no valid points after filtering.")
-    else:
-        st.info("No 'Year Joined' data available for Hiring Trends.")
-
-with tab2:
-    c1, c2 = st.columns(2)
-    safe_histogram(filtered_df, x="Harmonized title", color="Firm Name", title="Harmonized Title Distribution")
-    safe_histogram(filtered_df, x="Harmonized team", color="Firm Name", title="Harmonized Team Distribution")
-    safe_histogram(filtered_df, x="Harmonized sub-team", color="Firm Name", title="Harmonized Sub-team Distribution")
-
-with tab3:
-    # Office distribution
-    safe_histogram(filtered_df, x="Current Office", color="Firm Name", title="Office Location Distribution")
-    # Education breakdown (if any)
-    edu_cols = [c for c in ["Masters Degree", "Undergraduate"] if can_plot_column(filtered_df, c)]
-    if edu_cols:
-        # melt only existing edu columns
-        edu_df = filtered_df.melt(id_vars=["Firm Name"], value_vars=edu_cols, var_name="Degree Type", value_name="Degree")
-        if not edu_df.empty and can_plot_column(edu_df, "Degree"):
-            try:
-                fig_edu = px.histogram(edu_df, x="Degree", color="Firm Name", facet_col="Degree Type", barmode="group", title="Education Background Comparison")
-                st.plotly_chart(fig_edu, use_container_width=True)
-            except Exception as e:
-                st.error(f"Could not render Education chart: {e}")
+            st.info("No 'Firm Name' data to show Team Size.")
+
+        # Hiring trends (if Year Joined exists)
+        if has_years:
+            fig3 = build_hiring_trend(file_digest, filter_key, filtered_df)
+            if fig3 is not None:
+                st.plotly_chart(fig3, use_container_width=True)
+            else:
+                st.info("Year data exists but no valid points after filtering.")
         else:
-            st.info("No education data available to plot.")
-    else:
-        st.info("No 'Masters Degree' or 'Undergraduate' data available.")
+            st.info("No 'Year Joined' data available for Hiring Trends.")
 
-    # Committee memberships
-    safe_histogram(filtered_df, x="Committee memberships", color="Firm Name", title="Committee Membership Counts")
+    if st.session_state.active_tab == tab_labels[1]:
+        safe_bar(filtered_df, x="Harmonized title", color="Firm Name", title="Harmonized Title Distribution")
+        safe_bar(filtered_df, x="Harmonized team", color="Firm Name", title="Harmonized Team Distribution")
+        safe_bar(filtered_df, x="Harmonized sub-team", color="Firm Name", title="Harmonized Sub-team Distribution")
+
+    if st.session_state.active_tab == tab_labels[2]:
+        # Office distribution
+        safe_bar(filtered_df, x="Current Office", color="Firm Name", title="Office Location Distribution")
+        # Education breakdown (if any)
+        edu_cols = [c for c in ["Masters Degree", "Undergraduate"] if can_plot_column(filtered_df, c)]
+        if edu_cols:
+            edu_counts = get_edu_counts(file_digest, filter_key, filtered_df, tuple(edu_cols))
+            if not edu_counts.empty:
+                try:
+                    fig_edu = px.bar(edu_counts, x="Degree", y="Count", color="Firm Name", facet_col="Degree Type", barmode="group", title="Education Background Comparison")
+                    st.plotly_chart(fig_edu, use_container_width=True)
+                except Exception as e:
+                    st.error(f"Could not render Education chart: {e}")
+            else:
+                st.info("No education data available to plot.")
+        else:
+            st.info("No 'Masters Degree' or 'Undergraduate' data available.")
+
+        # Committee memberships
+        safe_bar(filtered_df, x="Committee memberships", color="Firm Name", title="Committee Membership Counts")
+
+render_views(filtered_df)
 
 # Optional: show filtered table and allow download
 with st.expander("Show filtered data (first 200 rows)"):
     st.dataframe(filtered_df.head(200), use_container_width=True)
 
-# Download button
+# Download button -- Arrow's C++ writer, cached per upload + filter selection
+@st.cache_data(show_spinner=False, max_entries=32)
+def to_csv_bytes(file_digest, filter_key, _df):
+    buf = io.BytesIO()
+    pacsv.write_csv(pa.Table.from_pandas(_df, preserve_index=False), buf)
+    return buf.getvalue()
+
 try:
-    csv = filtered_df.to_csv(index=False).encode("utf-8")
+    csv = to_csv_bytes(file_digest, filter_key, filtered_df)
     st.download_button("Download filtered CSV", csv, "filtered_competitors.csv", "text/csv")
 except Exception:
     st.info("Download not available for this dataset.")